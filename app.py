@@ -1,5 +1,6 @@
 from flask import Flask, render_template, send_from_directory, request
 from flask_socketio import SocketIO, emit
+import atexit
 import base64
 import os
 import logging
@@ -11,11 +12,12 @@ from elevenlabs.client import ElevenLabs
 from io import BytesIO
 
 # Import utilities
-from utils.llm import get_llm_response, build_booking_system_prompt
+from utils.llm import stream_llm_response, build_booking_system_prompt, summarize_conversation
 from utils.audio import convert_webm_to_wav, combine_audio_files
-from utils.recording import save_recording_metadata
+from utils.recording import LatencyStats, save_recording_metadata
 from utils.booking_state import get_or_create_session
-from utils.calendar import initialize_calendar
+from utils.llm_parser import fast_path_reply
+from utils.calendar import initialize_calendar, compact_calendar
 from utils.vad import initialize_vad, validate_speech, trim_silence
 
 # Load environment variables
@@ -76,7 +78,7 @@ initialize_calendar()
 initialize_vad()
 
 # Global latency tracking
-latency_records = []
+latency_stats = LatencyStats()
 
 # LLM functions moved to utils/llm.py
 
@@ -206,24 +208,37 @@ def handle_audio_data(data):
         session_id_booking = request.sid  # Use Flask-SocketIO's session ID
         booking_session = get_or_create_session(session_id_booking)
 
-        # Build system prompt based on current booking state
-        system_prompt = build_booking_system_prompt(booking_session)
+        # Build system prompt (static) and prior turns as chat messages
+        system_prompt, history_messages = build_booking_system_prompt(booking_session)
 
-        # Get LLM response (with timing)
+        # Get LLM response (with timing) - single-field answers skip the LLM
         llm_start = time.time()
-        llm_response = get_llm_response(
-            transcription,
-            LLM_PROVIDER,
-            openrouter_key=OPENROUTER_API_KEY,
-            cohere_key=COHERE_API_KEY,
-            system_message=system_prompt
-        )
+        llm_response = fast_path_reply(transcription, booking_session)
+        if llm_response is None:
+            # Stream chunks to the frontend as they arrive, then send the full text below
+            chunks = []
+            for chunk in stream_llm_response(
+                transcription,
+                LLM_PROVIDER,
+                openrouter_key=OPENROUTER_API_KEY,
+                cohere_key=COHERE_API_KEY,
+                system_message=system_prompt,
+                history_messages=history_messages
+            ):
+                chunks.append(chunk)
+                emit('bot_response_chunk', {'user_text': transcription, 'text': chunk})
+            llm_response = "".join(chunks)
         latency_info['llm_response'] = (time.time() - llm_start) * 1000
         logger.info(f"LLM response received ({latency_info['llm_response']:.2f}ms)")
 
         # Add this conversation turn to history
         booking_session.add_to_history(transcription, llm_response)
 
+        # Periodically summarize older turns off the response path
+        # (only Cohere is sent the history - OpenRouter gets the message alone)
+        if LLM_PROVIDER == 'cohere' and booking_session.needs_summary():
+            socketio.start_background_task(summarize_conversation, booking_session, COHERE_API_KEY)
+
         # TTS is now handled by frontend using ElevenLabs via Puter.js
         # No backend TTS generation needed!
         latency_info['tts_generation'] = 0  # Frontend handles this
@@ -244,7 +259,7 @@ def handle_audio_data(data):
                 timestamp,
                 latency_info,
                 METADATA_DIR,
-                latency_records
+                latency_stats
             )
             # Clean up temporary user audio file
             os.remove(user_wav_path)
@@ -277,4 +292,11 @@ if __name__ == '__main__':
     logger.info("=" * 60)
     logger.info("Server running on http://localhost:5001")
     logger.info("Ready for requests!")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5001, allow_unsafe_werkzeug=True)
+
+    # Fold the calendar journal into the snapshot on shutdown - only in the serving
+    # process, as with the reloader the parent process just watches for changes
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        atexit.register(compact_calendar)
+
+    socketio.run(app, debug=debug, host='0.0.0.0', port=5001, allow_unsafe_werkzeug=True)
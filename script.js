@@ -302,7 +302,23 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log('Disconnected from backend server');
     });
 
+    // Show the response text as it streams in - bot_response replaces it with the final text
+    let streamingText = '';
+
+    socket.on('bot_response_chunk', function(data) {
+        streamingText += data.text;
+        transcriptionDisplay.innerHTML = `
+            <div style="margin-bottom: 10px; color: rgba(255, 255, 255, 0.6); font-size: 0.9rem;">
+                You: ${data.user_text}
+            </div>
+            <div style="color: #ff8e3a;">
+                Assistant: ${streamingText}
+            </div>
+        `;
+    });
+
     socket.on('bot_response', function(data) {
+        streamingText = '';
         console.log('User said:', data.user_text);
         console.log('Bot responded:', data.bot_text);
 
@@ -387,6 +403,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
     socket.on('error', function(data) {
         console.error('Error from backend:', data.message);
+        streamingText = '';
         transcriptionDisplay.textContent = 'Error: ' + data.message;
         transcriptionDisplay.style.borderColor = '#ff4444';
 
@@ -3,11 +3,19 @@ Booking state management for Garage Booking Assistant
 Tracks conversation history for each session
 """
 import logging
+import threading
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
 # Session storage (in production, use Redis or similar)
 sessions = {}
+_sessions_lock = threading.Lock()  # Only taken to create/delete sessions
+
+# Keep the prompt bounded: last 6 turns (12 messages) verbatim, older turns summarized
+MAX_HISTORY_TURNS = 6
+SUMMARY_INTERVAL = 4  # Summarize every 4 turns (8 messages), before anything falls out of the window
+SUMMARY_KEEP_TURNS = 2  # Turns (4 messages) kept verbatim after summarizing
 
 
 class BookingState:
@@ -15,31 +23,84 @@ class BookingState:
 
     def __init__(self, session_id):
         self.session_id = session_id
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=MAX_HISTORY_TURNS)
+        self.summary = None  # Summary of turns no longer kept verbatim
+        self.turn_count = 0
+        self.history_version = 0  # Bumped on every history change
+        self.prompt_cache = None  # (history_version, history_messages) - see llm.build_booking_system_prompt
         self.booking_data = None  # Will be populated when ready to book
+        # Guards conversation_history - summaries are applied from a background task
+        self.lock = threading.Lock()
 
     def add_to_history(self, user_text, bot_text):
         """Add conversation turn to history"""
-        self.conversation_history.append({
-            'user': user_text,
-            'bot': bot_text
-        })
-        logger.info(f"Session {self.session_id}: Added to history (total turns: {len(self.conversation_history)})")
+        with self.lock:
+            self.conversation_history.append({
+                'user': user_text,
+                'bot': bot_text
+            })
+            self.turn_count += 1
+            self.history_version += 1
+        logger.info(f"Session {self.session_id}: Added to history (total turns: {self.turn_count})")
+
+    def needs_summary(self):
+        """Check if it's time to fold older turns into the summary"""
+        return self.turn_count > 0 and self.turn_count % SUMMARY_INTERVAL == 0
+
+    def apply_summary(self, summary, upto_turn):
+        """
+        Replace older turns with a summary
+        upto_turn: turn_count when the summarized history was taken
+        """
+        with self.lock:
+            # Keep turns added while the summary was being generated
+            keep = max(SUMMARY_KEEP_TURNS, self.turn_count - upto_turn)
+            recent = list(self.conversation_history)[-keep:]
+            self.conversation_history.clear()
+            self.conversation_history.extend(recent)
+            self.summary = summary
+            self.history_version += 1
+        logger.info(f"Session {self.session_id}: Summarized history (kept {len(recent)} turns)")
 
     def get_conversation_history(self):
         """Get conversation history as formatted string"""
-        if not self.conversation_history:
-            return "No previous conversation."
+        return self.get_history_snapshot()[0]
+
+    def get_history_snapshot(self):
+        """
+        Get (formatted history, turn_count) from one consistent read, so a turn
+        added meanwhile can't be counted without being in the text
+        """
+        with self.lock:
+            turns = list(self.conversation_history)
+            summary = self.summary
+            turn_count = self.turn_count
+
+        if not turns and not summary:
+            return "No previous conversation.", turn_count
 
         history_text = []
-        for turn in self.conversation_history:
+        if summary:
+            history_text.append(f"Summary of earlier conversation: {summary}")
+        for turn in turns:
             history_text.append(f"User: {turn['user']}")
             history_text.append(f"Assistant: {turn['bot']}")
-        return "\n".join(history_text)
+        return "\n".join(history_text), turn_count
+
+    def as_messages(self):
+        """Get conversation history as chat messages (summary first, then one message per side of each turn)"""
+        messages = []
+        if self.summary:
+            messages.append({'role': 'system', 'content': f"Summary of earlier conversation: {self.summary}"})
+        for turn in self.get_history_list():
+            messages.append({'role': 'user', 'content': turn['user']})
+            messages.append({'role': 'assistant', 'content': turn['bot']})
+        return messages
 
     def get_history_list(self):
-        """Get raw conversation history"""
-        return self.conversation_history
+        """Get raw conversation history (a snapshot - safe to iterate while turns are added)"""
+        with self.lock:
+            return list(self.conversation_history)
 
     def set_booking_data(self, data):
         """Store extracted booking data"""
@@ -52,24 +113,32 @@ class BookingState:
 
     def reset(self):
         """Reset state to empty"""
-        self.conversation_history = []
+        with self.lock:
+            self.conversation_history.clear()
+            self.summary = None
+            self.turn_count = 0
+            self.history_version += 1
         self.booking_data = None
         logger.info(f"Session {self.session_id}: Reset state")
 
 
 def get_or_create_session(session_id):
     """Get existing session or create new one"""
-    if session_id not in sessions:
-        sessions[session_id] = BookingState(session_id)
-        logger.info(f"Created new session: {session_id}")
-    return sessions[session_id]
+    session = sessions.get(session_id)
+    if session is None:
+        with _sessions_lock:
+            session = sessions.get(session_id)
+            if session is None:
+                session = sessions[session_id] = BookingState(session_id)
+                logger.info(f"Created new session: {session_id}")
+    return session
 
 
 def delete_session(session_id):
     """Delete a session"""
-    if session_id in sessions:
-        del sessions[session_id]
-        logger.info(f"Deleted session: {session_id}")
+    with _sessions_lock:
+        if sessions.pop(session_id, None) is not None:
+            logger.info(f"Deleted session: {session_id}")
 
 
 def get_all_sessions():
@@ -4,14 +4,176 @@ Handles slot availability, bookings, and calendar operations
 """
 import os
 import json
+import functools
 import logging
-from datetime import datetime, timedelta
+import mmap
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to stdlib json
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
-CALENDAR_FILE = 'calendar.json'
+CALENDAR_FILE = 'calendar.json'  # Snapshot
+CALENDAR_LOG = 'calendar.jsonl'  # Append-only journal of bookings/cancellations since the snapshot
 WORKING_HOURS = list(range(9, 17))  # 9am to 4pm (last slot at 4pm)
 WORKING_DAYS = [0, 1, 2, 3, 4]  # Monday to Friday
+HOUR_STRS = {hour: f"{hour:02d}" for hour in WORKING_HOURS}  # Calendar slot keys
+
+# Parsed calendar, reused until the snapshot's or journal's mtime changes
+_cache = {'data': None, 'mtime': (0, 0)}
+
+MMAP_MIN_SIZE = 64 * 1024  # Smaller snapshots are cheaper to read() than to map
+COMPACT_AFTER = 500  # Journal entries before the snapshot is rewritten
+_log_entries = 0
+# load_calendar hands every caller the same dict - mutations, index updates, journal
+# appends and snapshot writes all happen under this lock (reentrant: book_slot holds it
+# across load, check and commit)
+_calendar_lock = threading.RLock()
+
+# Secondary indexes for find_booking: lowercased name/reg -> {(date_str, hour_str)}
+# Rebuilt whenever a different calendar dict is loaded
+_index = {'calendar': None, 'name': {}, 'reg': {}}
+
+
+def _json_loads(raw):
+    """Parse calendar JSON bytes"""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _json_dumps(data):
+    """Serialize calendar to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _read_snapshot():
+    """Parse the JSON snapshot, parsing large files straight from a memory map"""
+    with open(CALENDAR_FILE, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)  # No copy into a bytes object
+        return _json_loads(f.read())
+
+
+def _file_mtimes():
+    """mtimes of the snapshot and journal (0 if missing)"""
+    mtimes = []
+    for path in (CALENDAR_FILE, CALENDAR_LOG):
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except FileNotFoundError:
+            mtimes.append(0)
+    return tuple(mtimes)
+
+
+def _apply_entry(calendar, entry):
+    """Apply one journal entry to a calendar dict (idempotent)"""
+    if entry['op'] == 'book':
+        calendar.setdefault(entry['date'], {})[entry['hour']] = entry['data']
+    elif entry['op'] == 'free' and entry['date'] in calendar:
+        calendar[entry['date']][entry['hour']] = None
+
+
+def _replay_log(calendar):
+    """
+    Apply the journal on top of a snapshot
+    Returns: number of entries applied
+    """
+    try:
+        with open(CALENDAR_LOG, 'rb') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return 0
+
+    applied = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            _apply_entry(calendar, _json_loads(line))
+            applied += 1
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Skipping bad calendar journal entry: {e}")  # e.g. torn write on crash
+    return applied
+
+
+def _commit_entry(calendar, entry):
+    """
+    Durably append one entry to the journal, then apply it to the calendar
+    O(1) bytes per booking instead of rewriting the whole calendar
+    Returns: False (calendar untouched) if the journal write failed
+    """
+    global _log_entries
+    with _calendar_lock:
+        try:
+            with open(CALENDAR_LOG, 'ab') as f:
+                end = f.tell()
+                try:
+                    f.write(_json_dumps(entry) + b'\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                except Exception:
+                    f.truncate(end)  # Don't leave a torn line for the next entry to run into
+                    raise
+            _cache['mtime'] = _file_mtimes()  # Our own write - don't reload
+            _log_entries += 1
+        except Exception as e:
+            logger.error(f"Error writing calendar journal: {e}")
+            return False
+        _apply_entry(calendar, entry)
+
+    if _log_entries >= COMPACT_AFTER:
+        compact_calendar()
+    return True
+
+
+def _hour_str(hour):
+    """Calendar slot key for an hour (e.g. 9 -> '09')"""
+    return HOUR_STRS[hour] if hour in HOUR_STRS else str(hour).zfill(2)  # Also accepts "9" / "11"
+
+
+def _index_key(value):
+    """Normalize a name/reg for index lookups"""
+    return value.lower() if value else None
+
+
+def _index_add(calendar, date_str, hour_str, booking):
+    """Add a booking to the indexes (no-op if they belong to another calendar)"""
+    if _index['calendar'] is not calendar:
+        return
+    for field in ('name', 'reg'):
+        key = _index_key(booking.get(field))
+        if key:
+            _index[field].setdefault(key, set()).add((date_str, hour_str))
+
+
+def _index_remove(calendar, date_str, hour_str, booking):
+    """Remove a booking from the indexes"""
+    if _index['calendar'] is not calendar:
+        return
+    for field in ('name', 'reg'):
+        key = _index_key(booking.get(field))
+        if key in _index[field]:
+            _index[field][key].discard((date_str, hour_str))
+
+
+def _get_index(calendar):
+    """Get the name/reg indexes for this calendar, building them if needed"""
+    if _index['calendar'] is not calendar:
+        _index['calendar'] = calendar
+        _index['name'] = {}
+        _index['reg'] = {}
+        for date_str, day_slots in calendar.items():
+            for hour_str, booking in day_slots.items():
+                if booking is not None:
+                    _index_add(calendar, date_str, hour_str, booking)
+    return _index
 
 
 def initialize_calendar():
@@ -23,26 +185,116 @@ def initialize_calendar():
 
 
 def load_calendar():
-    """Load calendar from JSON file"""
+    """
+    Load calendar from the JSON snapshot plus the journal
+    Served from memory unless either file changed on disk since the last read
+    """
+    global _log_entries
     initialize_calendar()
     try:
-        with open(CALENDAR_FILE, 'r') as f:
-            return json.load(f)
+        with _calendar_lock:
+            mtimes = _file_mtimes()
+            if _cache['data'] is not None and mtimes == _cache['mtime']:
+                return _cache['data']
+
+            data = _read_snapshot()
+            _log_entries = _replay_log(data)
+            _cache['data'] = data
+            _cache['mtime'] = mtimes
+            return data
     except Exception as e:
         logger.error(f"Error loading calendar: {e}")
         return {}
 
 
-def save_calendar(calendar_data):
-    """Save calendar to JSON file"""
+def _snapshot_mode():
+    """File mode for a new snapshot - the current file's, or what open() would give"""
     try:
-        with open(CALENDAR_FILE, 'w') as f:
-            json.dump(calendar_data, f, indent=2)
+        return os.stat(CALENDAR_FILE).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _write_snapshot(calendar_data):
+    """
+    Write calendar_data as the JSON snapshot and empty the journal (caller holds _calendar_lock)
+    Returns: True on success
+    """
+    global _log_entries
+    tmp_path = None
+    try:
+        # Write to a unique temp file and swap it in, so a crash never leaves a partial file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(CALENDAR_FILE)), prefix='.calendar-', suffix='.tmp'
+        )
+        with os.fdopen(fd, 'wb') as f:
+            os.fchmod(f.fileno(), _snapshot_mode())  # mkstemp creates 0600 and os.replace keeps it
+            f.write(_json_dumps(calendar_data))
+            f.flush()
+            os.fsync(f.fileno())  # Snapshot must be on disk before the journal is emptied
+        os.replace(tmp_path, CALENDAR_FILE)
+        tmp_path = None
+        # Snapshot now includes every journal entry (replay is idempotent if we crash here)
+        open(CALENDAR_LOG, 'wb').close()
+        _cache['mtime'] = _file_mtimes()
+        _log_entries = 0
         logger.info("Calendar saved successfully")
         return True
     except Exception as e:
         logger.error(f"Error saving calendar: {e}")
         return False
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_calendar(calendar_data):
+    """
+    Save the whole calendar as a fresh JSON snapshot
+    Bookings and cancellations don't need this - book_slot/free_slot journal them
+    """
+    with _calendar_lock:
+        if not _write_snapshot(calendar_data):
+            return False
+        _cache['data'] = calendar_data
+        return True
+
+
+def compact_calendar():
+    """
+    Fold the journal into a fresh snapshot
+    Registered at exit by the serving process (see app.py) - not on import, so
+    tools and the reloader's watcher process never touch the calendar files
+    """
+    load_calendar()
+    with _calendar_lock:
+        if _cache['data'] is None:
+            return False  # Nothing loaded - never replace the snapshot with an empty one
+        return _write_snapshot(_cache['data'])
+
+
+def _parse_date(date_str):
+    """
+    Parse a YYYY-MM-DD date (zero padding optional, as with strptime)
+    Raises: ValueError for anything else, e.g. '20261020' or '2026-W43-2'
+    """
+    try:
+        day = date.fromisoformat(date_str)
+        if day.isoformat() == date_str:
+            return day  # Canonical form - the common case, no strptime needed
+    except ValueError:
+        pass
+    return datetime.strptime(date_str, '%Y-%m-%d').date()
+
+
+def _date_key(date_str):
+    """Calendar key for a date - one spelling per day, so '2026-1-5' and '2026-01-05' share slots"""
+    try:
+        return _parse_date(date_str).isoformat()
+    except (TypeError, ValueError):
+        return date_str
 
 
 def is_valid_date(date_str):
@@ -51,14 +303,14 @@ def is_valid_date(date_str):
     date_str: YYYY-MM-DD format
     """
     try:
-        date = datetime.strptime(date_str, '%Y-%m-%d')
+        day = _parse_date(date_str)
 
         # Check if it's in the past
-        if date.date() < datetime.now().date():
+        if day < date.today():
             return False, "Date is in the past"
 
         # Check if it's a weekday (Monday=0, Sunday=6)
-        if date.weekday() not in WORKING_DAYS:
+        if day.weekday() not in WORKING_DAYS:
             return False, "We're closed on weekends"
 
         return True, "Valid date"
@@ -66,41 +318,46 @@ def is_valid_date(date_str):
         return False, "Invalid date format"
 
 
-def get_available_slots(date_str):
+def get_available_slots(date_str, calendar=None):
     """
     Get available time slots for a specific date
+    calendar: already-loaded calendar (optional, avoids a reload)
     Returns list of available hours
     """
-    calendar = load_calendar()
+    if calendar is None:
+        calendar = load_calendar()
+    date_str = _date_key(date_str)
 
-    # Check if date exists in calendar
-    if date_str not in calendar:
-        # Date not in calendar means all slots are free
-        return WORKING_HOURS
+    with _calendar_lock:
+        # Check if date exists in calendar
+        if date_str not in calendar:
+            # Date not in calendar means all slots are free
+            return WORKING_HOURS
 
-    day_slots = calendar[date_str]
-    available = []
+        day_slots = calendar[date_str]
+        available = []
 
-    for hour in WORKING_HOURS:
-        hour_str = str(hour).zfill(2)
-        if hour_str not in day_slots or day_slots[hour_str] is None:
-            available.append(hour)
+        for hour, hour_str in HOUR_STRS.items():
+            if day_slots.get(hour_str) is None:
+                available.append(hour)
 
-    return available
+        return available
 
 
-def is_slot_available(date_str, hour):
+def is_slot_available(date_str, hour, calendar=None):
     """
     Check if a specific slot is available
     hour: int (9-16)
+    calendar: already-loaded calendar (optional, avoids a reload)
     """
-    calendar = load_calendar()
+    if calendar is None:
+        calendar = load_calendar()
+    date_str = _date_key(date_str)
 
     if date_str not in calendar:
         return True
 
-    hour_str = str(hour).zfill(2)
-    return hour_str not in calendar[date_str] or calendar[date_str][hour_str] is None
+    return calendar[date_str].get(_hour_str(hour)) is None
 
 
 def book_slot(date_str, hour, booking_details):
@@ -112,64 +369,63 @@ def book_slot(date_str, hour, booking_details):
     valid, msg = is_valid_date(date_str)
     if not valid:
         return False, msg
+    date_str = _date_key(date_str)
 
     # Validate hour
     if hour not in WORKING_HOURS:
         return False, f"Invalid time. We're open from {WORKING_HOURS[0]}:00 to {WORKING_HOURS[-1]}:00"
 
-    # Check availability
-    if not is_slot_available(date_str, hour):
-        return False, "Slot is already booked"
-
-    # Load calendar
-    calendar = load_calendar()
-
-    # Initialize date if not exists
-    if date_str not in calendar:
-        calendar[date_str] = {}
-
-    # Book the slot
-    hour_str = str(hour).zfill(2)
-    calendar[date_str][hour_str] = {
-        'name': booking_details.get('name'),
-        'reg': booking_details.get('reg'),
-        'mileage': booking_details.get('mileage'),
-        'model': booking_details.get('model'),
-        'has_contract': booking_details.get('has_contract'),
-        'issue': booking_details.get('issue'),
-        'booked_at': datetime.now().isoformat()
-    }
-
-    # Save calendar
-    if save_calendar(calendar):
-        logger.info(f"Booked slot: {date_str} at {hour}:00 for {booking_details.get('name')}")
-        return True, "Booking successful"
-    else:
-        return False, "Failed to save booking"
+    with _calendar_lock:
+        # Load calendar
+        calendar = load_calendar()
+
+        # Check availability
+        if not is_slot_available(date_str, hour, calendar):
+            return False, "Slot is already booked"
+
+        # Book the slot
+        hour_str = HOUR_STRS[hour]
+        booking = {
+            'name': booking_details.get('name'),
+            'reg': booking_details.get('reg'),
+            'mileage': booking_details.get('mileage'),
+            'model': booking_details.get('model'),
+            'has_contract': booking_details.get('has_contract'),
+            'issue': booking_details.get('issue'),
+            'booked_at': datetime.now().isoformat()
+        }
+        # Journal first - memory only changes once the booking is on disk
+        if _commit_entry(calendar, {'op': 'book', 'date': date_str, 'hour': hour_str, 'data': booking}):
+            _index_add(calendar, date_str, hour_str, booking)
+            logger.info(f"Booked slot: {date_str} at {hour}:00 for {booking_details.get('name')}")
+            return True, "Booking successful"
+        else:
+            return False, "Failed to save booking"
 
 
 def free_slot(date_str, hour):
     """
     Free a specific slot (for cancellation/rescheduling)
     """
-    calendar = load_calendar()
-
-    if date_str not in calendar:
-        return False, "No bookings on this date"
+    with _calendar_lock:
+        calendar = load_calendar()
+        date_str = _date_key(date_str)
 
-    hour_str = str(hour).zfill(2)
-    if hour_str not in calendar[date_str] or calendar[date_str][hour_str] is None:
-        return False, "Slot was not booked"
+        if date_str not in calendar:
+            return False, "No bookings on this date"
 
-    # Free the slot
-    calendar[date_str][hour_str] = None
+        hour_str = _hour_str(hour)
+        if calendar[date_str].get(hour_str) is None:
+            return False, "Slot was not booked"
 
-    # Save calendar
-    if save_calendar(calendar):
-        logger.info(f"Freed slot: {date_str} at {hour}:00")
-        return True, "Slot freed successfully"
-    else:
-        return False, "Failed to free slot"
+        # Free the slot - journal first, as in book_slot
+        booking = calendar[date_str][hour_str]
+        if _commit_entry(calendar, {'op': 'free', 'date': date_str, 'hour': hour_str}):
+            _index_remove(calendar, date_str, hour_str, booking)
+            logger.info(f"Freed slot: {date_str} at {hour}:00")
+            return True, "Slot freed successfully"
+        else:
+            return False, "Failed to free slot"
 
 
 def find_booking(name=None, reg=None):
@@ -177,24 +433,17 @@ def find_booking(name=None, reg=None):
     Find a booking by name or registration
     Returns: list of (date, hour, booking_details)
     """
-    calendar = load_calendar()
-    results = []
+    with _calendar_lock:
+        calendar = load_calendar()
+        index = _get_index(calendar)
 
-    for date_str, day_slots in calendar.items():
-        for hour_str, booking in day_slots.items():
-            if booking is None:
-                continue
+        slots = set()
+        if name:
+            slots |= index['name'].get(_index_key(name), set())
+        if reg:
+            slots |= index['reg'].get(_index_key(reg), set())
 
-            match = False
-            if name and booking.get('name', '').lower() == name.lower():
-                match = True
-            if reg and booking.get('reg', '').lower() == reg.lower():
-                match = True
-
-            if match:
-                results.append((date_str, int(hour_str), booking))
-
-    return results
+        return [(date_str, int(hour_str), calendar[date_str][hour_str]) for date_str, hour_str in sorted(slots)]
 
 
 def format_time_slot(hour):
@@ -207,25 +456,29 @@ def format_time_slot(hour):
         return f"{hour - 12}:00 PM"
 
 
+LOOKAHEAD_DAYS = 14
+
+
+@functools.lru_cache(maxsize=1)
+def _upcoming_weekdays(today_ordinal):
+    """Working-day date strings for the next LOOKAHEAD_DAYS days (cached per day)"""
+    today = date.fromordinal(today_ordinal)
+    upcoming = (today + timedelta(days=i) for i in range(LOOKAHEAD_DAYS))
+    return tuple(day.strftime('%Y-%m-%d') for day in upcoming if day.weekday() in WORKING_DAYS)
+
+
 def get_next_available_slots(max_results=3):
     """
     Get next available slots across upcoming days
     Returns list of (date_str, hour, formatted_time)
     """
     results = []
-    current_date = datetime.now().date()
-
-    # Look ahead up to 14 days
-    for i in range(14):
-        check_date = current_date + timedelta(days=i)
-        date_str = check_date.strftime('%Y-%m-%d')
-
-        # Skip weekends
-        if check_date.weekday() not in WORKING_DAYS:
-            continue
+    calendar = load_calendar()
 
+    # Look ahead up to 14 days, weekends skipped
+    for date_str in _upcoming_weekdays(date.today().toordinal()):
         # Get available slots for this day
-        available = get_available_slots(date_str)
+        available = get_available_slots(date_str, calendar)
 
         for hour in available:
             results.append((date_str, hour, format_time_slot(hour)))
@@ -3,68 +3,167 @@ LLM Provider utilities for Garage Booking Assistant
 Supports multiple LLM providers: OpenRouter, Cohere
 """
 import logging
-import requests
 import json
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
 import cohere
+import httpx
+
+from utils import semantic_cache
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional - fall back to stdlib json
+    orjson = None
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Exact-match response cache: key -> (timestamp, response)
+_RESPONSE_CACHE = OrderedDict()
+_CACHE_MAX = 2048
+_CACHE_TTL = 1800  # 30 minutes
+_CACHE_LOCK = threading.Lock()
+# Messages with digits (mileage, registrations) are unique - don't cache them
+_UNCACHEABLE_RE = re.compile(r'\d')
+# The history is part of the semantic cache key, so paraphrase hits only happen
+# on the opening turn ("hi" / "hello there") - later turns skip it entirely
+SEMANTIC_CACHE_MAX_HISTORY = 0
+
+# Provider clients shared across requests, keyed by API key
+_COHERE_CLIENTS = {}
+_OPENROUTER_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Static prompt text is sent as the literal first bytes of every request so
+# provider-side prefix caching can reuse it across sessions. Keep these prompts
+# free of timestamps, session IDs or anything else that varies per call.
+DEFAULT_SYSTEM_PROMPT = "You are a helpful garage booking assistant. Help users book garage appointments, check availability, and answer questions about garage services. Be concise and friendly."
+
+
+def _cohere_client(api_key):
+    """Get a Cohere client for this API key (created once, then reused)"""
+    client = _COHERE_CLIENTS.get(api_key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _COHERE_CLIENTS.get(api_key)
+            if client is None:
+                client = _COHERE_CLIENTS[api_key] = cohere.ClientV2(api_key)
+    return client
+
+
+def _openrouter_headers(api_key):
+    """Request headers for OpenRouter"""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:5000",
+        "X-Title": "Garage Booking Assistant",
+    }
+
+
+def _split_openrouter_body():
+    """
+    Serialize the constant parts of the OpenRouter request body once
+    Returns: (prefix, suffix) bytes around the JSON-escaped user message
+    """
+    placeholder = "\x00"
+    body = json.dumps({
+        "model": "qwen/qwen3-4b:free",
+        "messages": [
+            {
+                "role": "user",
+                "content": f"{DEFAULT_SYSTEM_PROMPT}\n\nUser: {placeholder}\nAssistant:"
+            }
+        ],
+        "max_tokens": 500
+    })
+    prefix, suffix = body.split(json.dumps(placeholder)[1:-1])
+    return prefix.encode('utf-8'), suffix.encode('utf-8')
+
+
+_OR_PREFIX, _OR_SUFFIX = _split_openrouter_body()
+
+
+def _openrouter_body(user_message):
+    """Request body for OpenRouter - only the user message is serialized per call"""
+    if orjson is not None:
+        escaped = orjson.dumps(user_message)[1:-1]
+    else:
+        escaped = json.dumps(user_message)[1:-1].encode('utf-8')
+    return _OR_PREFIX + escaped + _OR_SUFFIX
+
+
+def _openrouter_client(api_key):
+    """
+    Get a pooled keep-alive HTTP/2 client for OpenRouter (created once, then reused)
+    HTTP/2 lets concurrent requests share one connection
+    """
+    client = _OPENROUTER_CLIENTS.get(api_key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _OPENROUTER_CLIENTS.get(api_key)
+            if client is None:
+                client = _OPENROUTER_CLIENTS[api_key] = httpx.Client(
+                    http2=True,
+                    timeout=30,
+                    headers=_openrouter_headers(api_key),
+                    limits=httpx.Limits(max_connections=16, max_keepalive_connections=4)
+                )
+    return client
+
 
 def get_llm_response_openrouter(user_message, api_key):
     """Get response from OpenRouter API"""
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:5000",
-                "X-Title": "Garage Booking Assistant",
-            },
-            data=json.dumps({
-                "model": "qwen/qwen3-4b:free",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": f"You are a helpful garage booking assistant. Help users book garage appointments, check availability, and answer questions about garage services. Be concise and friendly.\n\nUser: {user_message}\nAssistant:"
-                    }
-                ],
-                "max_tokens": 500
-            }),
-            timeout=30
+        response = _openrouter_client(api_key).post(
+            OPENROUTER_URL,
+            content=_openrouter_body(user_message)
         )
 
         response.raise_for_status()
-        result = response.json()
+        result = _json_loads(response.content)
         return result['choices'][0]['message']['content']
 
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(f"OpenRouter HTTP Error: {e}")
-        try:
-            error_detail = response.json()
-            logger.error(f"API Error details: {error_detail}")
-        except:
-            logger.error(f"Response text: {response.text}")
+        logger.error(f"API Error details: {response.text}")
         raise
     except Exception as e:
         logger.error(f"OpenRouter Error: {e}")
         raise
 
 
-def get_llm_response_cohere(user_message, api_key, system_message=None):
-    """ Get response from Cohere API"""
+def _cohere_messages(user_message, system_message, history_messages):
+    """Chat messages for Cohere: static system prompt first, then prior turns, then the new message"""
+    messages = [{"role": "system", "content": system_message}]
+    if history_messages:
+        messages.extend(history_messages)
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def get_llm_response_cohere(user_message, api_key, system_message=None, history_messages=None):
+    """
+    Get response from Cohere API
+    history_messages: optional prior turns as chat messages, sent after the
+        static system_message so the prompt prefix stays cacheable
+    """
     try:
-        co = cohere.ClientV2(api_key)
+        co = _cohere_client(api_key)
 
         if system_message is None:
-            system_message = "You are a helpful garage booking assistant. Help users book garage appointments, check availability, and answer questions about garage services. Be concise and friendly."
+            system_message = DEFAULT_SYSTEM_PROMPT
 
         response = co.chat(
             model="command-a-03-2025",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
+            messages=_cohere_messages(user_message, system_message, history_messages),
             max_tokens=500
         )
 
@@ -75,14 +174,35 @@ def get_llm_response_cohere(user_message, api_key, system_message=None):
         raise
 
 
-def build_booking_system_prompt(booking_state):
+def stream_llm_response_cohere(user_message, api_key, system_message=None, history_messages=None):
     """
-    Build a conversation-aware system prompt
-    Uses history instead of tracking individual fields - simpler and faster
+    Stream response from Cohere API
+    Yields text chunks as they are generated
     """
-    conversation_history = booking_state.get_conversation_history()
+    try:
+        co = _cohere_client(api_key)
 
-    system_prompt = f"""You are a garage booking assistant. Your job is to collect booking information efficiently.
+        if system_message is None:
+            system_message = DEFAULT_SYSTEM_PROMPT
+
+        for event in co.chat_stream(
+            model="command-a-03-2025",
+            messages=_cohere_messages(user_message, system_message, history_messages),
+            max_tokens=500
+        ):
+            if event.type == "content-delta":
+                text = event.delta.message.content.text
+                if text:
+                    yield text
+
+    except Exception as e:
+        logger.error(f"Cohere Error: {e}")
+        raise
+
+
+# Booking prompt - identical on every turn so providers can reuse its KV cache.
+# Conversation history goes in separate user/assistant messages after it.
+BOOKING_SYSTEM_PROMPT = """You are a garage booking assistant. Your job is to collect booking information efficiently.
 
 INFORMATION NEEDED (in order):
 1. Full name
@@ -92,9 +212,6 @@ INFORMATION NEEDED (in order):
 5. Service contract/warranty? (yes/no)
 6. What service or issue brings them in
 
-CONVERSATION SO FAR:
-{conversation_history}
-
 RULES:
 - Be concise - max 2 short sentences
 - Ask for ONE missing piece of information at a time
@@ -104,24 +221,167 @@ RULES:
 - Once you have all 6, say you'll check available dates
 - Don't be chatty - stay focused on the task"""
 
-    return system_prompt
 
+def build_booking_system_prompt(booking_state):
+    """
+    Build a conversation-aware system prompt
+    Uses history instead of tracking individual fields - simpler and faster
+    Returns: (static_system_prompt, history_messages)
+    History messages are cached on booking_state until its history changes, so
+    retries within a turn send byte-identical prompts
+    """
+    cached = booking_state.prompt_cache
+    if cached is not None and cached[0] == booking_state.history_version:
+        return BOOKING_SYSTEM_PROMPT, cached[1]
+
+    history_messages = booking_state.as_messages()
+    booking_state.prompt_cache = (booking_state.history_version, history_messages)
+    return BOOKING_SYSTEM_PROMPT, history_messages
+
+
+SUMMARY_SYSTEM_PROMPT = """Summarize this garage booking conversation in 1-2 short sentences.
+Keep every detail the customer has given (name, registration, make and model, mileage, warranty, issue).
+Reply with the summary only."""
+
+
+def summarize_conversation(booking_state, cohere_key):
+    """
+    Fold older turns of a session into a short summary
+    Cohere only - the OpenRouter path sends no history, so it has nothing to summarize
+    Runs in the background - leaves history untouched on failure
+    """
+    history_text, upto_turn = booking_state.get_history_snapshot()
 
-def get_llm_response(user_message, provider, openrouter_key=None, cohere_key=None, system_message=None):
-    """Get response from configured LLM provider"""
     try:
-        logger.info(f"Sending to {provider.upper()}: {user_message}")
+        summary = get_llm_response_cohere(history_text, cohere_key, system_message=SUMMARY_SYSTEM_PROMPT)
+        booking_state.apply_summary(summary.strip(), upto_turn)
+
+    except Exception as e:
+        logger.error(f"Error summarizing conversation: {e}")
+
+
+def _response_cache_key(user_message, provider, system_message):
+    """Cache key for a request, or None if it shouldn't be cached"""
+    if _UNCACHEABLE_RE.search(user_message):
+        return None
+    raw = f"{provider}|{system_message or ''}|{user_message.strip().lower()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_get(key):
+    """Get a cached response if present and not expired"""
+    with _CACHE_LOCK:
+        entry = _RESPONSE_CACHE.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] >= _CACHE_TTL:
+            del _RESPONSE_CACHE[key]
+            return None
+        _RESPONSE_CACHE.move_to_end(key)
+        return entry[1]
+
+
+def _cache_put(key, llm_response):
+    """Store a response, evicting the least recently used over _CACHE_MAX"""
+    with _CACHE_LOCK:
+        _RESPONSE_CACHE[key] = (time.time(), llm_response)
+        _RESPONSE_CACHE.move_to_end(key)
+        while len(_RESPONSE_CACHE) > _CACHE_MAX:
+            _RESPONSE_CACHE.popitem(last=False)
+
+
+def _cache_lookup(user_message, provider, system_message, history_messages):
+    """
+    Check the exact-match and semantic caches
+    Returns: (cached_response or None, cache_key, cache_prompt) - the key and
+    prompt are passed back to _cache_store once the provider has answered
+    (cache_prompt is None when the semantic cache is skipped)
+    """
+    cache_prompt = system_message or ''
+    if history_messages:
+        cache_prompt += "\n" + "\n".join(f"{m['role']}: {m['content']}" for m in history_messages)
+    cache_key = _response_cache_key(user_message, provider, cache_prompt)
+    if cache_key is not None:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            logger.info("LLM response served from cache")
+            return cached, cache_key, cache_prompt
+
+    if len(history_messages or ()) > SEMANTIC_CACHE_MAX_HISTORY:
+        return None, cache_key, None  # No semantic store either
+
+    cached = semantic_cache.lookup(user_message, provider, cache_prompt)
+    if cached is not None:
+        logger.info("LLM response served from semantic cache")
+    return cached, cache_key, cache_prompt
+
+
+def _cache_store(user_message, provider, cache_key, cache_prompt, llm_response):
+    """
+    Store a provider response in both caches
+    cache_prompt: None to skip the semantic cache (see _cache_lookup)
+    """
+    if cache_key is not None:
+        _cache_put(cache_key, llm_response)
+    if cache_prompt is not None and semantic_cache.is_cacheable(user_message):
+        # Embedding (and the first model load) happens off the response path
+        threading.Thread(
+            target=semantic_cache.store,
+            args=(user_message, provider, cache_prompt, llm_response),
+            daemon=True
+        ).start()
+
+
+def get_llm_response(user_message, provider, openrouter_key=None, cohere_key=None, system_message=None, history_messages=None):
+    """
+    Get response from configured LLM provider
+    Collects stream_llm_response, so both share one cache and logging path
+    """
+    return "".join(stream_llm_response(
+        user_message,
+        provider,
+        openrouter_key=openrouter_key,
+        cohere_key=cohere_key,
+        system_message=system_message,
+        history_messages=history_messages
+    ))
+
+
+def stream_llm_response(user_message, provider, openrouter_key=None, cohere_key=None, system_message=None, history_messages=None):
+    """
+    Stream response from configured LLM provider
+    Yields text chunks; OpenRouter (no streaming) yields the full response once
+    """
+    chunks = []
+    try:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Streaming from %s: %s", provider.upper(), user_message)
+
+        cached, cache_key, cache_prompt = _cache_lookup(user_message, provider, system_message, history_messages)
+        if cached is not None:
+            yield cached
+            return
 
         if provider == 'openrouter':
-            llm_response = get_llm_response_openrouter(user_message, openrouter_key)
+            stream = iter([get_llm_response_openrouter(user_message, openrouter_key)])
         elif provider == 'cohere':
-            llm_response = get_llm_response_cohere(user_message, cohere_key, system_message=system_message)
+            stream = stream_llm_response_cohere(
+                user_message, cohere_key, system_message=system_message, history_messages=history_messages
+            )
         else:
             raise ValueError(f"Unknown LLM provider: {provider}")
 
-        logger.info(f"LLM response: {llm_response}")
-        return llm_response
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+
+        llm_response = "".join(chunks)
+        _cache_store(user_message, provider, cache_key, cache_prompt, llm_response)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("LLM response: %s", llm_response)
 
     except Exception as e:
         logger.error(f"Error getting LLM response: {e}")
-        return "I'm sorry, I'm having trouble processing your request right now. Please try again."
+        if not chunks:
+            yield "I'm sorry, I'm having trouble processing your request right now. Please try again."
@@ -0,0 +1,228 @@
+"""
+Booking info extraction utilities for Garage Booking Assistant
+Regex fast path for single-field answers, so the LLM is only called when needed
+"""
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+# Booking fields in the order the assistant asks for them (keys as in calendar.book_slot)
+FIELD_ORDER = ['name', 'reg', 'model', 'mileage', 'has_contract', 'issue']
+
+REG_RE = re.compile(r'\b[A-Z]{2}\d{2}\s?[A-Z]{3}\b', re.I)  # UK reg, e.g. AB12 CDE
+MILEAGE_RE = re.compile(r'\b(\d{1,3}(?:,\d{3})+|\d{4,7})\b')
+YES_NO_RE = re.compile(r'\b(?:(yes|yeah|yep)|(no|nope|nah))\b', re.I)
+NAME_RE = re.compile(r"^(?i:my name is |i'?m |it'?s |this is )?([A-Z][a-z]+(?: [A-Z][a-z]+)+)")
+MAX_YES_NO_WORDS = 6  # Longer answers are probably more than a plain yes/no
+
+# Words allowed around a matched field - anything else means the message says
+# more than the one answer ("AB12 CDE, it's a Ford Focus") and goes to the LLM
+WORD_RE = re.compile(r"[a-z']+")
+FILLER_WORDS = {'it', "it's", 'its', 'is', 'the', 'a', 'an', 'my', 'i', "i'm", 'im', 'um', 'uh',
+                'ok', 'okay', 'sure', 'yes', 'yeah', 'thanks', 'thank', 'you', 'please'}
+FIELD_FILLER_WORDS = {
+    'name': {'name', 'this', 'here', 'call', 'me'},
+    'reg': {'reg', 'registration', 'number', 'plate'},
+    'mileage': {'about', 'around', 'roughly', 'approximately', 'just', 'over', 'under', 'currently',
+                'miles', 'mile', 'mileage', 'on', 'clock', 'done', 'has'},
+    'has_contract': {'no', 'do', 'dont', "don't", 'not', 'have', 'has', 'got', 'one',
+                     'contract', 'warranty', 'service', 'with', 'us'},
+}
+# Capitalised words that start replies but never names ("Yes Please", "Hello There")
+NOT_NAME_WORDS = FILLER_WORDS | {'no', 'nope', 'nah', 'yep', 'hello', 'hi', 'hey', 'hiya', 'good',
+                                 'morning', 'afternoon', 'evening', 'well', 'so', 'sorry', 'excuse'}
+
+# Keywords in the assistant's last question -> field it asked for
+QUESTION_KEYWORDS = [
+    ('registration', 'reg'),
+    ('mileage', 'mileage'),
+    ('warranty', 'has_contract'),
+    ('contract', 'has_contract'),
+    ('make', 'model'),
+    ('model', 'model'),
+    ('name', 'name'),
+]
+# One pass over the question instead of a substring scan per keyword
+QUESTION_KEYWORD_RE = re.compile('|'.join(keyword for keyword, _ in QUESTION_KEYWORDS))
+
+# Canned question for the next field once a field has been extracted
+NEXT_QUESTIONS = {
+    'reg': "Thanks{name}! What's your car registration number?",
+    'model': "Got it. What's the make and model of your car?",
+    'mileage': "Thanks. What's the current mileage?",
+    'has_contract': "Do you have a service contract or warranty with us?",
+    'issue': "And what service or issue brings you in today?",
+}
+
+# Hand-tuned logistic scorer: does the message contain an extractable field?
+SCORE_WEIGHTS = {
+    'bias': -2.0,
+    'has_digit': 0.5,
+    'digit_run': 4.5,  # Longest digit run / 6 - mileage
+    'has_reg': 5.0,
+    'has_yes_no': 3.0,
+    'has_name': 3.5,
+    'word_count': -2.5,  # Words / 10 - long messages need the LLM
+}
+SCORE_HIGH = 0.85  # Above: extract with regex even if the question is unclear
+SCORE_LOW = 0.15  # Below: chitchat - skip extraction
+DIGIT_RUN_RE = re.compile(r'\d+')
+# Fields tried, in order, when the message is confidently booking info
+DETECT_ORDER = ['reg', 'mileage', 'name', 'has_contract']
+
+# Fast path hit/miss counts, logged so templates and patterns can be tuned
+fast_path_stats = {'hits': 0, 'misses': 0}
+
+
+def get_expected_field(booking_state):
+    """
+    Work out which field the user is answering from the assistant's last question
+    Returns: field name, or None if it can't be told (including the first turn,
+    before anything has been asked)
+    """
+    history = booking_state.get_history_list()
+    if not history:
+        return None
+
+    found = set(QUESTION_KEYWORD_RE.findall(history[-1]['bot'].lower()))
+    if not found:
+        return None
+
+    # Several keywords can appear - the earliest in QUESTION_KEYWORDS wins
+    for keyword, field in QUESTION_KEYWORDS:
+        if keyword in found:
+            return field
+
+
+def get_collected_fields(booking_state):
+    """
+    Fields the conversation already covers: asked in an earlier turn (and so
+    answered in the turn after), mentioned in the summary, or volunteered by the user
+    Returns: set of field names
+    """
+    history = booking_state.get_history_list()
+    texts = [turn['bot'].lower() for turn in history[:-1]]
+    if booking_state.summary:
+        texts.append(booking_state.summary.lower())
+
+    asked = set(QUESTION_KEYWORD_RE.findall(" ".join(texts)))
+    collected = {field for keyword, field in QUESTION_KEYWORDS if keyword in asked}
+
+    for turn in history:
+        if REG_RE.search(turn['user']):
+            collected.add('reg')
+        if MILEAGE_RE.search(turn['user']):
+            collected.add('mileage')
+    return collected
+
+
+def _match_name(text):
+    """Match a full name at the start of text, or None if it starts with a non-name word"""
+    match = NAME_RE.match(text)
+    if match and match.group(1).split(' ', 1)[0].lower() in NOT_NAME_WORDS:
+        return None
+    return match
+
+
+def _is_whole_answer(user_message, match, field):
+    """Check the match is the whole message, give or take filler words"""
+    rest = (user_message[:match.start()] + " " + user_message[match.end():]).lower().replace('\u2019', "'")
+    if DIGIT_RUN_RE.search(rest):
+        return False
+    allowed = FILLER_WORDS | FIELD_FILLER_WORDS[field]
+    return all(word in allowed for word in WORD_RE.findall(rest))
+
+
+def fast_extract(user_message, expected_field):
+    """
+    Extract a single expected field with regex
+    Only matches when the field is essentially all the message says
+    Returns: {field: value} or None if the regex doesn't match
+    """
+    if expected_field == 'reg':
+        match = REG_RE.search(user_message)
+        if match and _is_whole_answer(user_message, match, 'reg'):
+            return {'reg': match.group(0).upper()}
+
+    elif expected_field == 'mileage':
+        match = MILEAGE_RE.search(user_message)
+        if match and _is_whole_answer(user_message, match, 'mileage'):
+            return {'mileage': match.group(1).replace(',', '')}
+
+    elif expected_field == 'has_contract':
+        if user_message.count(' ') < MAX_YES_NO_WORDS:  # Rough word count, no list allocation
+            match = YES_NO_RE.search(user_message)
+            if match and _is_whole_answer(user_message, match, 'has_contract'):
+                # "yes"/"no" strings, as the booking prompt collects them
+                return {'has_contract': 'yes' if match.group(1) is not None else 'no'}
+
+    elif expected_field == 'name':
+        stripped = user_message.strip()
+        match = _match_name(stripped)
+        if match and _is_whole_answer(stripped, match, 'name'):
+            return {'name': match.group(1)}
+
+    return None
+
+
+def score_booking_info(user_message):
+    """
+    Score how likely a message contains an extractable booking field
+    Returns: probability-like score (0.0 to 1.0)
+    """
+    word_count = user_message.count(' ') + 1
+    digit_runs = DIGIT_RUN_RE.findall(user_message)
+    features = {
+        'has_digit': 1.0 if digit_runs else 0.0,
+        'digit_run': min(max(map(len, digit_runs), default=0) / 6, 1.0),
+        'has_reg': 1.0 if REG_RE.search(user_message) else 0.0,
+        'has_yes_no': 1.0 if word_count <= MAX_YES_NO_WORDS and YES_NO_RE.search(user_message) else 0.0,
+        'has_name': 1.0 if _match_name(user_message.strip()) else 0.0,
+        'word_count': min(word_count / 10, 1.0),
+    }
+    z = SCORE_WEIGHTS['bias'] + sum(SCORE_WEIGHTS[name] * value for name, value in features.items())
+    return 1 / (1 + math.exp(-z))
+
+
+def fast_path_reply(user_message, booking_state):
+    """
+    Answer single-field replies without an LLM call
+    Returns: canned next question, or None to fall back to the LLM
+    """
+    score = score_booking_info(user_message)
+    expected_field = get_expected_field(booking_state) if score >= SCORE_LOW else None
+    extracted = fast_extract(user_message, expected_field) if expected_field else None
+
+    # Question unclear but the message is confidently a field - detect which one,
+    # considering only fields still outstanding so a late correction or repeat
+    # doesn't rewind the conversation
+    if extracted is None and score > SCORE_HIGH:
+        collected = get_collected_fields(booking_state)
+        for field in DETECT_ORDER:
+            if field in collected:
+                continue
+            extracted = fast_extract(user_message, field)
+            if extracted is not None:
+                expected_field = field
+                break
+
+    # Ask for the first field still missing - never re-ask one the conversation has
+    next_field = None
+    if extracted is not None:
+        collected = get_collected_fields(booking_state) | {expected_field}
+        next_field = next((field for field in FIELD_ORDER if field not in collected), None)
+
+    if next_field not in NEXT_QUESTIONS:  # Nothing extracted, out of order, or all collected
+        fast_path_stats['misses'] += 1
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Fast path miss (hits: %d, misses: %d)", fast_path_stats['hits'], fast_path_stats['misses'])
+        return None
+
+    fast_path_stats['hits'] += 1
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Fast path hit: %s (hits: %d, misses: %d)", extracted, fast_path_stats['hits'], fast_path_stats['misses'])
+
+    name = extracted.get('name')
+    return NEXT_QUESTIONS[next_field].format(name=f", {name.split()[0]}" if name else "")
@@ -5,11 +5,37 @@ Handles saving recordings and metadata to disk
 import os
 import json
 import logging
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to stdlib json
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 
-def save_recording_metadata(session_id, user_text, bot_text, timestamp, latency_info, metadata_dir, latency_records):
+class LatencyStats:
+    """Running latency total/count, so the average is O(1) per recording"""
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()  # Turns are handled on concurrent threads
+
+    def add(self, latency_ms):
+        """Record a latency and return the new average"""
+        with self._lock:
+            self.total += latency_ms
+            self.count += 1
+            return self.total / self.count
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else 0.0
+
+
+def save_recording_metadata(session_id, user_text, bot_text, timestamp, latency_info, metadata_dir, latency_stats):
     """Save metadata for a recording session with latency information"""
     try:
         metadata_path = os.path.join(metadata_dir, f'{session_id}.json')
@@ -17,11 +43,8 @@ def save_recording_metadata(session_id, user_text, bot_text, timestamp, latency_
         # Calculate total latency
         total_latency = sum(latency_info.values())
 
-        # Add to global latency tracking
-        latency_records.append(total_latency)
-
-        # Calculate average latency
-        avg_latency = sum(latency_records) / len(latency_records)
+        # Add to global latency tracking and get the running average
+        avg_latency = latency_stats.add(total_latency)
 
         metadata = {
             'session_id': session_id,
@@ -39,11 +62,15 @@ def save_recording_metadata(session_id, user_text, bot_text, timestamp, latency_
                 'total': round(total_latency, 2)
             },
             'average_latency_ms': round(avg_latency, 2),
-            'session_count': len(latency_records)
+            'session_count': latency_stats.count
         }
 
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        if orjson is not None:
+            with open(metadata_path, 'wb') as f:
+                f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+        else:
+            with open(metadata_path, 'w') as f:
+                json.dump(metadata, f, indent=2)
 
         logger.info(f"Saved metadata: {metadata_path}")
         logger.info(f"Total latency: {total_latency:.2f}ms | Average: {avg_latency:.2f}ms")
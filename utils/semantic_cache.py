@@ -0,0 +1,123 @@
+"""
+Semantic response cache for Garage Booking Assistant
+Reuses LLM responses for paraphrased messages ("hi" / "hey!" / "hello there")
+"""
+import logging
+import hashlib
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:  # Optional - the cache is disabled without these packages
+    SEMANTIC_CACHE_AVAILABLE = False
+
+MODEL_NAME = 'all-MiniLM-L6-v2'  # 22 MB, CPU-only
+SIMILARITY_THRESHOLD = 0.88
+MAX_ENTRIES = 4096
+MAX_WORDS = 6  # Only short greetings/confirmations are worth matching
+SEARCH_K = 4  # Neighbours checked for a matching system prompt
+
+_DIGIT_RE = re.compile(r'\d')
+
+# Global embedder and index (loaded on first use)
+_model = None
+_index = None
+_entries = []  # (system_hash, user_message, response), parallel to the index
+_hash_counts = {}  # system_hash -> entries stored under it, so lookups can skip embedding
+_disabled = not SEMANTIC_CACHE_AVAILABLE
+_lock = threading.Lock()
+
+
+def is_cacheable(user_message):
+    """
+    Check if a message is safe to answer from the semantic cache
+    Skips anything that looks like booking info - "My name is Bob" must not
+    reuse the answer given to "My name is Alice"
+    """
+    words = user_message.split()
+    if not words or len(words) > MAX_WORDS:
+        return False
+    if _DIGIT_RE.search(user_message):
+        return False  # Mileage, registrations
+    # Capitalised words after the first are likely names or car makes
+    return not any(word[0].isupper() for word in words[1:])
+
+
+def _system_hash(provider, system_message):
+    """Hash provider + system prompt so responses are never blended across them"""
+    return hashlib.sha256(f"{provider}|{system_message or ''}".encode()).hexdigest()
+
+
+def _load_model():
+    """Load the embedder and create the index (caller holds _lock)"""
+    global _model, _index, _disabled
+    if _model is not None or _disabled:
+        return _model is not None
+    try:
+        logger.info(f"Loading semantic cache model ({MODEL_NAME})...")
+        _model = SentenceTransformer(MODEL_NAME, device='cpu')
+        _index = faiss.IndexFlatIP(_model.get_sentence_embedding_dimension())
+        logger.info("✓ Semantic cache model loaded successfully")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to load semantic cache model, disabling cache: {e}")
+        _disabled = True
+        return False
+
+
+def _embed(user_message):
+    """Normalized embedding, so inner product == cosine similarity"""
+    return np.asarray(_model.encode([user_message], normalize_embeddings=True), dtype='float32')
+
+
+def lookup(user_message, provider, system_message):
+    """
+    Find a cached response for a paraphrase of user_message
+    Returns: cached response or None
+    """
+    if _disabled or not is_cacheable(user_message):
+        return None
+
+    system_hash = _system_hash(provider, system_message)
+    if system_hash not in _hash_counts:
+        return None  # Nothing stored for this prompt - no need to load the model or embed
+
+    with _lock:
+        if not _load_model() or _index.ntotal == 0:
+            return None
+
+        D, I = _index.search(_embed(user_message), SEARCH_K)
+        for score, idx in zip(D[0], I[0]):
+            if idx < 0 or score < SIMILARITY_THRESHOLD:
+                break  # Results are sorted by similarity
+            if _entries[idx][0] == system_hash:
+                return _entries[idx][2]
+
+        return None
+
+
+def store(user_message, provider, system_message, response):
+    """Add a response to the semantic cache (slow on first use - call off the response path)"""
+    if _disabled or not is_cacheable(user_message):
+        return
+
+    with _lock:
+        if not _load_model():
+            return
+
+        # Flat index can't evict cheaply - start over once full
+        if _index.ntotal >= MAX_ENTRIES:
+            _index.reset()
+            _entries.clear()
+            _hash_counts.clear()
+
+        system_hash = _system_hash(provider, system_message)
+        _index.add(_embed(user_message))
+        _entries.append((system_hash, user_message, response))
+        _hash_counts[system_hash] = _hash_counts.get(system_hash, 0) + 1
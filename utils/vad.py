@@ -3,6 +3,8 @@ Voice Activity Detection utilities using Silero VAD
 Detects speech in audio and trims silence
 """
 import logging
+import numpy as np
+import soundfile as sf
 import torch
 from silero_vad import load_silero_vad, read_audio, get_speech_timestamps
 from pydub import AudioSegment
@@ -13,6 +15,10 @@ logger = logging.getLogger(__name__)
 # Global VAD model (loaded once at startup)
 vad_model = None
 
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_SAMPLES = 512  # Silero's frame size at 16 kHz
+SILENCE_RMS_THRESHOLD = 0.005  # Below this (samples in -1..1) a clip is treated as silence
+
 
 def initialize_vad():
     """Load Silero VAD model once at startup"""
@@ -21,6 +27,13 @@ def initialize_vad():
         logger.info("Loading Silero VAD model...")
         torch.set_num_threads(1)  # For efficiency on CPU
         vad_model = load_silero_vad()
+
+        # Warm up with one silent 32ms frame, so the first request doesn't pay
+        # for TorchScript's profiling/optimization passes
+        with torch.no_grad():
+            vad_model(torch.zeros(VAD_FRAME_SAMPLES), VAD_SAMPLE_RATE)
+        vad_model.reset_states()
+
         logger.info("✓ Silero VAD model loaded successfully")
         return True
     except Exception as e:
@@ -49,6 +62,12 @@ def validate_speech(wav_path, min_speech_duration_ms=250):
         # Read audio
         wav = read_audio(wav_path)
 
+        # Near-silent clips can't hold enough speech - skip the model
+        rms = float(wav.square().mean().sqrt()) if wav.numel() else 0.0
+        if rms < SILENCE_RMS_THRESHOLD:
+            logger.info(f"Audio too quiet for speech in {wav_path} (RMS: {rms:.4f})")
+            return False, 0
+
         # Get speech timestamps
         speech_timestamps = get_speech_timestamps(
             wav,
@@ -94,13 +113,17 @@ def trim_silence(wav_path, output_path=None):
         return False, wav_path, 0
 
     try:
-        # Read audio
-        wav = read_audio(wav_path)
+        # Read audio once - the same samples feed VAD and the trimmed output
+        audio_np, sample_rate = sf.read(wav_path, dtype='int16')
+        if audio_np.ndim > 1:
+            audio_np = audio_np.mean(axis=1).astype(np.int16)  # Downmix to mono
+        wav = torch.from_numpy(audio_np.astype(np.float32) / 32768.0)
 
         # Get speech timestamps
         speech_timestamps = get_speech_timestamps(
             wav,
             vad_model,
+            sampling_rate=sample_rate,
             return_seconds=True
         )
 
@@ -108,28 +131,21 @@ def trim_silence(wav_path, output_path=None):
             logger.warning(f"No speech detected in {wav_path}, cannot trim")
             return False, wav_path, 0
 
-        # Load audio with pydub
-        audio = AudioSegment.from_wav(wav_path)
-        original_duration = len(audio)
-
-        # Extract speech segments
-        speech_segments = []
-        for segment in speech_timestamps:
-            start_ms = int(segment['start'] * 1000)
-            end_ms = int(segment['end'] * 1000)
-            speech_segments.append(audio[start_ms:end_ms])
-
-        # Combine all speech segments
-        trimmed_audio = sum(speech_segments) if len(speech_segments) > 1 else speech_segments[0]
+        # Extract and combine speech segments
+        trimmed_audio = np.concatenate([
+            audio_np[int(segment['start'] * sample_rate):int(segment['end'] * sample_rate)]
+            for segment in speech_timestamps
+        ])
 
         # Generate output path if not provided
         if output_path is None:
             output_path = wav_path.replace('.wav', '_trimmed.wav')
 
         # Export trimmed audio
-        trimmed_audio.export(output_path, format='wav')
+        sf.write(output_path, trimmed_audio, sample_rate, subtype='PCM_16')
 
-        duration_saved = original_duration - len(trimmed_audio)
+        original_duration = len(audio_np) * 1000 // sample_rate
+        duration_saved = original_duration - len(trimmed_audio) * 1000 // sample_rate
         logger.info(f"Trimmed silence: saved {duration_saved}ms ({duration_saved/original_duration*100:.1f}%)")
 
         return True, output_path, duration_saved